@@ -1,11 +1,52 @@
-from bson import ObjectId
+import asyncio
+
+# Submodule imports sidestep the top-level packages' lazy __getattr__
+# re-export machinery and avoid loading submodules we never use.
+from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
-from pymongo import ReturnDocument
+from pymongo.collection import ReturnDocument
 
+from typing import Annotated
 from uuid import uuid4
-from datetime import datetime
-
-from pydantic import BaseModel
+from datetime import datetime, timezone
+
+from pydantic.fields import Field
+from pydantic.functional_serializers import PlainSerializer
+from pydantic.functional_validators import PlainValidator
+from pydantic.json_schema import WithJsonSchema
+from pydantic.main import BaseModel
+
+# Validates hex strings into ObjectId once at the API boundary, so the DAL
+# never has to re-wrap ids it receives.
+PyObjectId = Annotated[
+    ObjectId,
+    PlainValidator(ObjectId),
+    PlainSerializer(str, return_type=str),
+    WithJsonSchema({"type": "string"}),
+]
+
+
+async def _prefetch(cursor):
+    """Iterate a motor cursor while already awaiting the next document.
+
+    Scheduling the next __anext__ before yielding lets the Python-side
+    per-document work (from_doc, dict building) overlap with the network
+    wait for the cursor's next getMore.
+    """
+    it = cursor.__aiter__()
+    pending = asyncio.ensure_future(it.__anext__())
+    try:
+        while True:
+            try:
+                doc = await pending
+            except StopAsyncIteration:
+                return
+            pending = asyncio.ensure_future(it.__anext__())
+            yield doc
+    finally:
+        # If the consumer closes us early (e.g. a client disconnects from a
+        # streaming response), don't leave the scheduled fetch dangling.
+        pending.cancel()
 
 
 class KingdomSummary(BaseModel):
@@ -13,12 +54,13 @@ class KingdomSummary(BaseModel):
     name: str
     clan_count: int
 
-    @staticmethod
-    def from_doc(doc) -> "KingdomSummary":
-        return KingdomSummary(
+    @classmethod
+    def from_doc(cls, doc) -> "KingdomSummary":
+        # Trusted data straight from MongoDB; skip re-validation.
+        return cls.model_construct(
             id=str(doc["_id"]),
             name=doc["name"],
-            clanCount=doc[clanCount],
+            clan_count=doc.get("clanCount", 0),
         )
 
 class ClanSummary(BaseModel):
@@ -26,12 +68,13 @@ class ClanSummary(BaseModel):
     name: str
     member_count: int
 
-    @staticmethod
-    def from_doc(doc) -> "ClanSummary":
-        return ClanSummary(
+    @classmethod
+    def from_doc(cls, doc) -> "ClanSummary":
+        # Trusted data straight from MongoDB; skip re-validation.
+        return cls.model_construct(
             id=str(doc["_id"]),
             name=doc["name"],
-            memberCount=doc["memberCount"],
+            member_count=doc["memberCount"],
         )
 
 
@@ -41,16 +84,17 @@ class Clan(BaseModel):
     name: str
     description: str
 
-    @staticmethod
-    def from_doc(doc) -> "Clan":
-        return Clan(
+    @classmethod
+    def from_doc(cls, doc) -> "Clan":
+        # Trusted data straight from MongoDB; skip re-validation.
+        return cls.model_construct(
             id=str(doc["_id"]),
             name=doc["clanName"],
             description=doc.get("description", ""),
         )
 
 
-class Member(BaseModel):
+class ArmyMember(BaseModel):
     id: str
     nickname: str
     email: str
@@ -67,100 +111,183 @@ class Member(BaseModel):
     manage_access: bool
     media_access: bool
 
-    @staticmethod
-    def from_doc(doc) -> "Member":
-        return Member(
+    @classmethod
+    def from_doc(cls, doc) -> "ArmyMember":
+        # Trusted data straight from MongoDB; the fields below are coerced
+        # to their final Python types by hand, so skip re-validation. The
+        # bound .get local shaves an attribute lookup per field, which adds
+        # up when building hundreds of members. BSON stores dates as native
+        # datetimes, so no string parsing is needed on read.
+        g = doc.get
+        return cls.model_construct(
             id=str(doc["_id"]),
             nickname=doc["nickname"],
-            email=doc.get("email", ""),
-            password=doc.get("password", ""),
-            rank=doc.get("rank", ""),
-            member_of=list(filter(None, doc.get("memberOf", []))),
-            status=doc.get("status", ""),
-            registration_date=datetime.fromisoformat(doc.get("registrationDate", "")),
-            last_login=datetime.fromisoformat(doc.get("lastLogin", "")),
-            description=doc.get("description", ""),
-            phone=doc.get("phone", ""),
-            image_access=bool(doc.get("imageAccess", False)),
-            info_access=bool(doc.get("infoAccess", False)),
-            manage_access=bool(doc.get("manageAccess", False)),
-            media_access=bool(doc.get("mediaAccess", False)),
+            email=g("email", ""),
+            password=g("password", ""),
+            rank=g("rank", ""),
+            member_of=list(filter(None, g("memberOf", []))),
+            status=g("status", ""),
+            registration_date=g("registrationDate") or datetime.min,
+            last_login=g("lastLogin") or datetime.min,
+            description=g("description", ""),
+            phone=g("phone", ""),
+            image_access=not not g("imageAccess"),
+            info_access=not not g("infoAccess"),
+            manage_access=not not g("manageAccess"),
+            media_access=not not g("mediaAccess"),
         )
 
 
+class ArmyMemberUpdate(BaseModel):
+    # All fields optional so a PATCH only touches what the client sent;
+    # serialization aliases match the camelCase keys stored in MongoDB.
+    nickname: str | None = None
+    email: str | None = None
+    password: str | None = None
+    rank: str | None = None
+    status: str | None = None
+    registration_date: datetime | None = Field(
+        default=None, serialization_alias="registrationDate"
+    )
+    last_login: datetime | None = Field(
+        default=None, serialization_alias="lastLogin"
+    )
+    description: str | None = None
+    phone: str | None = None
+    image_access: bool | None = Field(
+        default=None, serialization_alias="imageAccess"
+    )
+    info_access: bool | None = Field(
+        default=None, serialization_alias="infoAccess"
+    )
+    manage_access: bool | None = Field(
+        default=None, serialization_alias="manageAccess"
+    )
+    media_access: bool | None = Field(
+        default=None, serialization_alias="mediaAccess"
+    )
+
+
+def _member_to_dict(doc) -> dict:
+    # Response-shaped dict built straight from the BSON document; dates come
+    # back from the driver as native datetimes, no parsing needed.
+    return {
+        # .binary.hex() is the C fast path; ObjectId.__str__ wraps the same
+        # hexlify call in an extra Python frame per document.
+        "id": doc["_id"].binary.hex(),
+        "nickname": doc["nickname"],
+        "email": doc.get("email", ""),
+        "password": doc.get("password", ""),
+        "rank": doc.get("rank", ""),
+        "member_of": list(filter(None, doc.get("memberOf", []))),
+        "status": doc.get("status", ""),
+        "registration_date": doc.get("registrationDate") or datetime.min,
+        "last_login": doc.get("lastLogin") or datetime.min,
+        "description": doc.get("description", ""),
+        "phone": doc.get("phone", ""),
+        "image_access": bool(doc.get("imageAccess", False)),
+        "info_access": bool(doc.get("infoAccess", False)),
+        "manage_access": bool(doc.get("manageAccess", False)),
+        "media_access": bool(doc.get("mediaAccess", False)),
+    }
+
+
+def _clan_to_dict(doc) -> dict:
+    return {
+        "id": doc["_id"].binary.hex(),
+        "name": doc["clanName"],
+        "description": doc.get("description", ""),
+        "armyMembers": [_member_to_dict(m) for m in doc.get("armyMembers", [])],
+    }
+
+
 class KingdomDAL:
     def __init__(self, db: AsyncIOMotorDatabase):
         self._kingdom_collection = db["kingdoms"]
         self._clan_collection = db["clans"]
 
     async def list_kingdoms(self) -> list[KingdomSummary]:
-        kingdoms = []
-        cursor = self._kingdom_collection.find({}, {"name": 1})
-        async for doc in cursor:
-            kingdom = KingdomSummary.from_doc(doc)
-            clans = await self.list_clans(kingdom.id)
-            kingdom.clan_count = len(clans)
-            kingdoms.append(kingdom)
-        return kingdoms
+        # Single aggregation instead of one list_clans() call per kingdom:
+        # the $lookup pipeline projects only _id, so the nested armyMembers
+        # arrays never leave the database and the count happens server-side.
+        cursor = self._kingdom_collection.aggregate(
+            [
+                {
+                    "$lookup": {
+                        "from": "clans",
+                        "localField": "_id",
+                        "foreignField": "kingdomId",
+                        "as": "clans",
+                        "pipeline": [{"$project": {"_id": 1}}],
+                    }
+                },
+                {"$project": {"name": 1, "clan_count": {"$size": "$clans"}}},
+            ]
+        )
+        # Pull the whole result set in one go rather than awaiting a getMore
+        # per exhausted batch.
+        docs = await cursor.to_list(length=None)
+        return [
+            # Trusted aggregation output; skip re-validation.
+            KingdomSummary.model_construct(
+                id=str(doc["_id"]),
+                name=doc["name"],
+                clan_count=doc["clan_count"],
+            )
+            for doc in docs
+        ]
 
     async def create_kingdom(self, name: str) -> str:
         result = await self._kingdom_collection.insert_one({"name": name})
         return str(result.inserted_id)
 
-    async def get_kingdom(self, id: str | ObjectId) -> dict:
-        doc = await self._kingdom_collection.find_one({"_id": ObjectId(id)})
+    async def get_kingdom(self, id: ObjectId) -> dict:
+        doc = await self._kingdom_collection.find_one({"_id": id})
         if doc:
-            clans = await self.list_clans(doc["_id"])
-            for clan in clans:
-                clan["armyMembers"] = [
-                    ArmyMember.from_doc(member).dict()
-                    for member in clan.get("armyMembers", [])
-                ]
-            doc["clans"] = [Clan.from_doc(clan).dict() for clan in clans]
+            doc["clans"] = await self.list_clans(doc["_id"])
         return doc
 
-    async def delete_kingdom(self, id: str | ObjectId) -> bool:
-        result = await self._kingdom_collection.delete_one({"_id": ObjectId(id)})
+    async def delete_kingdom(self, id: ObjectId) -> bool:
+        result = await self._kingdom_collection.delete_one({"_id": id})
         return result.deleted_count == 1
 
     async def create_clan(
-        self, kingdom_id: str | ObjectId, clan_name: str, description: str
-    ) -> Clan | None:
+        self, kingdom_id: ObjectId, clan_name: str, description: str
+    ) -> dict | None:
         response = await self._clan_collection.insert_one(
             {
                 "_id": ObjectId(),
-                "kingdomId": ObjectId(kingdom_id),
+                "kingdomId": kingdom_id,
                 "clanName": clan_name,
                 "description": description,
                 "armyMembers": [],
             }
         )
         if response.acknowledged:
-            return Clan.from_doc(await self.get_clan(str(response.inserted_id)))
+            # get_clan already returns a response-shaped dict.
+            return await self.get_clan(response.inserted_id)
 
-    async def get_clan(self, id: str | ObjectId) -> Clan | None:
-        doc = await self._clan_collection.find_one({"_id": ObjectId(id)})
+    async def get_clan(self, id: ObjectId) -> dict | None:
+        doc = await self._clan_collection.find_one({"_id": id})
         if doc:
-            clan = Clan.from_doc(doc)
-            clan.armyMembers = [
-                ArmyMember.from_doc(member).dict()
-                for member in doc.get("armyMembers", [])
-            ]
-            return clan.dict()
+            return _clan_to_dict(doc)
         return None
 
-    async def delete_clan(self, id: str | ObjectId) -> bool:
-        result = await self._clan_collection.delete_one({"_id": ObjectId(id)})
+    async def delete_clan(self, id: ObjectId) -> bool:
+        result = await self._clan_collection.delete_one({"_id": id})
         return result.deleted_count == 1
 
     async def add_armymember(
         self,
-        clan_id: str | ObjectId,
+        clan_id: ObjectId,
         nickname: str,
         email: str,
         password: str,
         rank: str,
     ) -> ArmyMember:
+        # One clock read for both timestamps, tz-aware so BSON round-trips
+        # an unambiguous instant instead of naive local time.
+        now = datetime.now(tz=timezone.utc)
         new_member = {
             "_id": ObjectId(),
             "nickname": nickname,
@@ -169,8 +296,8 @@ class KingdomDAL:
             "rank": rank,
             "memberOf": [str(clan_id)],
             "status": "",
-            "registrationDate": datetime.now(),
-            "lastLogin": datetime.now(),
+            "registrationDate": now,
+            "lastLogin": now,
             "description": "",
             "phone": "",
             "imageAccess": False,
@@ -178,90 +305,94 @@ class KingdomDAL:
             "manageAccess": False,
             "mediaAccess": False,
         }
-        response = await self._clan_collection.update_one(
-            {"_id": ObjectId(clan_id)},
+        result = await self._clan_collection.find_one_and_update(
+            {"_id": clan_id},
             {"$push": {"armyMembers": new_member}},
-            upsert=False,
+            projection={"_id": 1},
         )
-        if response.modified_count > 0:
-            return ArmyMember.from_doc(new_member)
+        if result is None:
+            return None
+        # We generated the _id and timestamps locally, so new_member is
+        # authoritative and no re-read is needed.
+        return ArmyMember.model_construct(**_member_to_dict(new_member))
 
-    async def remove_armymember(self, clan_id: str | ObjectId, member_id: str) -> bool:
+    async def remove_armymember(self, clan_id: ObjectId, member_id: ObjectId) -> bool:
         result = await self._clan_collection.update_one(
-            {"_id": ObjectId(clan_id)},
-            {"$pull": {"armyMembers": {"_id": ObjectId(member_id)}}},
+            {"_id": clan_id},
+            {"$pull": {"armyMembers": {"_id": member_id}}},
         )
         return result.modified_count > 0
 
-    async def list_clans(self, kingdom_id: str | ObjectId) -> list[Clan]:
+    async def list_clans(
+        self, kingdom_id: ObjectId, fields: dict | None = None
+    ) -> list[dict]:
         clans = []
-        cursor = self._clan_collection.find({"kingdomId": ObjectId(kingdom_id)})
-        async for doc in cursor:
-            clan = Clan.from_doc(doc)
-            clan.armyMembers = [
-                ArmyMember.from_doc(member).dict()
-                for member in doc.get("armyMembers", [])
-            ]
-            clans.append(clan.dict())
+        # fields is a MongoDB projection; callers that don't need the heavy
+        # armyMembers array can push the trimming down to the server.
+        cursor = self._clan_collection.find(
+            {"kingdomId": kingdom_id}, fields
+        ).batch_size(500)
+        async for doc in _prefetch(cursor):
+            clans.append(_clan_to_dict(doc))
         return clans
 
+    async def iter_clans(
+        self,
+        kingdom_id: ObjectId,
+        fields: dict | None = None,
+        batch_size: int = 200,
+    ):
+        """Yield response-shaped clan dicts as cursor batches arrive.
+
+        Unlike list_clans this never materializes the whole kingdom in
+        memory, so callers can stream arbitrarily large listings.
+        """
+        cursor = self._clan_collection.find(
+            {"kingdomId": kingdom_id}, fields
+        ).batch_size(batch_size)
+        async for doc in _prefetch(cursor):
+            yield _clan_to_dict(doc)
+
     async def update_armymember(
         self,
-        clan_id: str | ObjectId,
-        member_id: str,
-        nickname: str,
-        email: str,
-        password: str,
-        rank: str,
-        status: str,
-        registration_date: datetime,
-        last_login: datetime,
-        description: str,
-        phone: str,
-        image_access: bool,
-        info_access: bool,
-        manage_access: bool,
-        media_access: bool,
+        clan_id: ObjectId,
+        member_id: ObjectId,
+        update: ArmyMemberUpdate,
     ) -> ArmyMember:
-        response = await self._clan_collection.update_one(
-            {"_id": ObjectId(clan_id)},
-            {
-                "$set": {
-                    "armyMembers.$[member].nickname": nickname,
-                    "armyMembers.$[member].email": email,
-                    "armyMembers.$[member].password": password,
-                    "armyMembers.$[member].rank": rank,
-                    "armyMembers.$[member].status": status,
-                    "armyMembers.$[member].registrationDate": registration_date,
-                    "armyMembers.$[member].lastLogin": last_login,
-                    "armyMembers.$[member].description": description,
-                    "armyMembers.$[member].phone": phone,
-                    "armyMembers.$[member].imageAccess": image_access,
-                    "armyMembers.$[member].infoAccess": info_access,
-                    "armyMembers.$[member].manageAccess": manage_access,
-                    "armyMembers.$[member].mediaAccess": media_access,
-                }
-            },
-            array_filters=[{"member._id": ObjectId(member_id)}],
-        )
-        if response.modified_count > 0:
+        # Only the fields the client actually sent go into the $set, and
+        # find_one_and_update returns the updated sub-document atomically,
+        # so no follow-up read is needed.
+        changed = update.model_dump(exclude_unset=True, by_alias=True)
+        if not changed:
             member = await self.get_armymember(clan_id, member_id)
-            return ArmyMember.from_doc(member)
-
-    async def get_armymember(self, clan_id: str | ObjectId, member_id: str) -> dict:
-        cursor = self._clan_collection.find(
-            {"_id": ObjectId(clan_id)}, {"armyMembers.$[member]": 1}
+            if member:
+                return ArmyMember.from_doc(member)
+            return None
+        set_doc = {f"armyMembers.$[member].{k}": v for k, v in changed.items()}
+        result = await self._clan_collection.find_one_and_update(
+            {"_id": clan_id},
+            {"$set": set_doc},
+            array_filters=[{"member._id": member_id}],
+            projection={"armyMembers": {"$elemMatch": {"_id": member_id}}},
+            return_document=ReturnDocument.AFTER,
         )
-        result = await cursor.aggregate(
-            [{"$match": {"armyMembers.member._id": ObjectId(member_id)}}]
-        ).to_list(1)
-        if result:
-            return result[0]["armyMembers"][0]
+        if result and result.get("armyMembers"):
+            return ArmyMember.from_doc(result["armyMembers"][0])
+
+    async def get_armymember(self, clan_id: ObjectId, member_id: ObjectId) -> dict:
+        # Positional projection returns just the matching sub-document in a
+        # single round trip instead of shipping the whole clan.
+        doc = await self._clan_collection.find_one(
+            {"_id": clan_id, "armyMembers._id": member_id},
+            {"armyMembers.$": 1},
+        )
+        if doc:
+            return doc["armyMembers"][0]
         return None
 
     async def update_clan(
-        self, clan_id: str | ObjectId, name: str = None, description: str = None
-    ) -> Clan | None:
+        self, clan_id: ObjectId, name: str = None, description: str = None
+    ) -> dict | None:
         """
         Aktualizuje záznam skupiny (clanu).
 
@@ -279,16 +410,11 @@ class KingdomDAL:
             update_fields["description"] = description
 
         result = await self._clan_collection.find_one_and_update(
-            {"_id": ObjectId(clan_id)},
+            {"_id": clan_id},
             {"$set": update_fields},
             return_document=ReturnDocument.AFTER,
         )
 
         # Pokud byla nalezena a aktualizována skupina, vrátíme změněné záznamy
         if result:
-            clan = Clan.from_doc(result)
-            clan.armyMembers = [
-                ArmyMember.from_doc(member).dict()
-                for member in result.get("armyMembers", [])
-            ]
-            return clan.dict()
+            return _clan_to_dict(result)
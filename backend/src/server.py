@@ -1,19 +1,24 @@
 from contextlib import asynccontextmanager
-from datetime import datetime
+from functools import lru_cache
 import os
 import sys
 
-from bson import ObjectId
-from fastapi import FastAPI, status
+# Submodule imports sidestep the top-level packages' lazy __getattr__
+# re-export machinery and avoid loading submodules we never use.
+from fastapi import FastAPI, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel
+import orjson
+from pydantic.main import BaseModel
+from pydantic.type_adapter import TypeAdapter
+from pymongo.errors import OperationFailure
+from pymongo.server_api import ServerApi
 import uvicorn
 
 # Import models and DAL from your project
-from dal import KingdomDAL, KingdomSummary, Clan, ArmyMember
+from dal import KingdomDAL, KingdomSummary, Clan, ArmyMember, ArmyMemberUpdate, PyObjectId
 
 
-COLLECTION_NAME_KINGDOMS = "kingdoms"
 COLLECTION_NAME_CLANS = "clans"
 MONGODB_URI = os.environ["MONGODB_URI"]
 DEBUG = os.environ.get("DEBUG", "").strip().lower() in {"1", "true", "on", "yes"}
@@ -21,8 +26,19 @@ DEBUG = os.environ.get("DEBUG", "").strip().lower() in {"1", "true", "on", "yes"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup:
-    client = AsyncIOMotorClient(MONGODB_URI)
+    # Startup. Pre-warming minPoolSize connections avoids TLS handshakes on
+    # the first request burst, and wire compression trims the bandwidth of
+    # the member-heavy list responses.
+    client = AsyncIOMotorClient(
+        MONGODB_URI,
+        maxPoolSize=50,
+        minPoolSize=10,
+        maxIdleTimeMS=60000,
+        waitQueueTimeoutMS=5000,
+        compressors="zstd,snappy",
+        retryReads=True,
+        server_api=ServerApi("1"),
+    )
     database = client.get_default_database()
 
     # Ensure the database is available:
@@ -30,23 +46,57 @@ async def lifespan(app: FastAPI):
     if int(pong["ok"]) != 1:
         raise Exception("Cluster connection is not okay!")
 
-    kingdoms_collection = database.get_collection(COLLECTION_NAME_KINGDOMS)
     clans_collection = database.get_collection(COLLECTION_NAME_CLANS)
 
+    # Indexes backing the hot lookups: kingdomId keeps the list_kingdoms
+    # $lookup off a collection scan, armyMembers._id serves the member
+    # array_filters/positional queries. Guarded so restarts stay quiet.
+    try:
+        await clans_collection.create_index([("kingdomId", 1)], background=True)
+        await clans_collection.create_index([("armyMembers._id", 1)])
+    except OperationFailure:
+        pass
+
     # Initialize DAL
-    app.kingdom_dal = KingdomDAL(kingdoms_collection, clans_collection)
+    app.kingdom_dal = KingdomDAL(database)
 
     yield
 
     client.close()
 
 
-app = FastAPI(lifespan=lifespan, debug=DEBUG)
+# orjson encodes dicts with datetimes in C, roughly 3x faster than the
+# stdlib json path on the mixed payloads the list endpoints return.
+# OPT_NAIVE_UTC pins naive datetimes to UTC on the wire.
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=_ORJSON_OPTS)
 
 
-@app.get("/api/kingdoms")
-async def get_all_kingdoms() -> list[KingdomSummary]:
-    return [i async for i in app.kingdom_dal.list_kingdoms()]
+app = FastAPI(lifespan=lifespan, debug=DEBUG, default_response_class=ORJSONResponse)
+
+
+@lru_cache(maxsize=64)
+def _ta(tp) -> TypeAdapter:
+    # Building a TypeAdapter runs a full pydantic-core schema build; cache it
+    # so each response type pays that cost once per process, not per request.
+    return TypeAdapter(tp)
+
+
+def _json_response(tp, content) -> Response:
+    # The DAL output is already trusted, so serialize it directly instead of
+    # letting FastAPI run a second validation pass over it.
+    return Response(
+        content=_ta(tp).dump_json(content), media_type="application/json"
+    )
+
+
+@app.get("/api/kingdoms", response_model=list[KingdomSummary])
+async def get_all_kingdoms() -> Response:
+    return _json_response(list[KingdomSummary], await app.kingdom_dal.list_kingdoms())
 
 
 class NewKingdom(BaseModel):
@@ -67,13 +117,13 @@ async def create_new_kingdom(new_kingdom: NewKingdom) -> NewKingdomResponse:
 
 
 @app.get("/api/kingdoms/{kingdom_id}")
-async def get_kingdom(kingdom_id: str) -> KingdomSummary:
-    return await app.kingdom_dal.get_kingdom(ObjectId(kingdom_id))
+async def get_kingdom(kingdom_id: PyObjectId) -> KingdomSummary:
+    return await app.kingdom_dal.get_kingdom(kingdom_id)
 
 
 @app.delete("/api/kingdoms/{kingdom_id}")
-async def delete_kingdom(kingdom_id: str) -> bool:
-    return await app.kingdom_dal.delete_kingdom(ObjectId(kingdom_id))
+async def delete_kingdom(kingdom_id: PyObjectId) -> bool:
+    return await app.kingdom_dal.delete_kingdom(kingdom_id)
 
 
 class NewClan(BaseModel):
@@ -91,20 +141,38 @@ class NewClanResponse(BaseModel):
     "/api/kingdoms/{kingdom_id}/clans",
     status_code=status.HTTP_201_CREATED,
 )
-async def create_new_clan(kingdom_id: str, new_clan: NewClan) -> Clan:
+async def create_new_clan(kingdom_id: PyObjectId, new_clan: NewClan) -> Clan:
     return await app.kingdom_dal.create_clan(
-        ObjectId(kingdom_id), new_clan.clan_name, new_clan.description
+        kingdom_id, new_clan.clan_name, new_clan.description
     )
 
 
-@app.get("/api/kingdoms/{kingdom_id}/clans")
-async def get_all_clans_of_kingdom(kingdom_id: str) -> list[Clan]:
-    return await app.kingdom_dal.list_clans(ObjectId(kingdom_id))
+async def _stream_clans(kingdom_id):
+    # Emit each clan as its own orjson fragment so peak memory stays at one
+    # cursor batch and the first bytes leave as soon as the first batch
+    # arrives, instead of buffering the whole kingdom and one big JSON blob.
+    yield b"["
+    first = True
+    # Passwords never need to cross the wire for this listing.
+    async for clan in app.kingdom_dal.iter_clans(
+        kingdom_id, fields={"armyMembers.password": 0}
+    ):
+        prefix = b"" if first else b","
+        first = False
+        yield prefix + orjson.dumps(clan, option=_ORJSON_OPTS)
+    yield b"]"
+
+
+@app.get("/api/kingdoms/{kingdom_id}/clans", response_model=None)
+async def get_all_clans_of_kingdom(kingdom_id: PyObjectId) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_clans(kingdom_id), media_type="application/json"
+    )
 
 
 @app.delete("/api/clans/{clan_id}")
-async def delete_clan(clan_id: str) -> bool:
-    return await app.kingdom_dal.delete_clan(ObjectId(clan_id))
+async def delete_clan(clan_id: PyObjectId) -> bool:
+    return await app.kingdom_dal.delete_clan(clan_id)
 
 
 class NewArmyMember(BaseModel):
@@ -118,9 +186,9 @@ class NewArmyMember(BaseModel):
     "/api/clans/{clan_id}/members",
     status_code=status.HTTP_201_CREATED,
 )
-async def create_armymember(clan_id: str, new_member: NewArmyMember) -> ArmyMember:
+async def create_armymember(clan_id: PyObjectId, new_member: NewArmyMember) -> ArmyMember:
     return await app.kingdom_dal.add_armymember(
-        ObjectId(clan_id),
+        clan_id,
         new_member.nickname,
         new_member.email,
         new_member.password,
@@ -129,52 +197,34 @@ async def create_armymember(clan_id: str, new_member: NewArmyMember) -> ArmyMemb
 
 
 @app.delete("/api/clans/{clan_id}/members/{member_id}")
-async def delete_armymember(clan_id: str, member_id: str) -> bool:
-    return await app.kingdom_dal.remove_armymember(ObjectId(clan_id), member_id)
-
-
-class ArmyMemberUpdate(BaseModel):
-    nickname: str
-    email: str
-    password: str
-    rank: str
-    status: str
-    registration_date: datetime
-    last_login: datetime
-    description: str
-    phone: str
-    image_access: bool
-    info_access: bool
-    manage_access: bool
-    media_access: bool
+async def delete_armymember(clan_id: PyObjectId, member_id: PyObjectId) -> bool:
+    return await app.kingdom_dal.remove_armymember(clan_id, member_id)
 
 
 @app.patch("/api/clans/{clan_id}/members/{member_id}")
 async def update_armymember(
-    clan_id: str, member_id: str, update: ArmyMemberUpdate
+    clan_id: PyObjectId, member_id: PyObjectId, update: ArmyMemberUpdate
 ) -> ArmyMember:
     return await app.kingdom_dal.update_armymember(
-        ObjectId(clan_id),
-        member_id,
-        update.nickname,
-        update.email,
-        update.password,
-        update.rank,
-        update.status,
-        update.registration_date,
-        update.last_login,
-        update.description,
-        update.phone,
-        update.image_access,
-        update.info_access,
-        update.manage_access,
-        update.media_access,
+        clan_id, member_id, update
     )
 
 
 def main(argv=sys.argv[1:]):
     try:
-        uvicorn.run("server:app", host="0.0.0.0", port=3001, reload=DEBUG)
+        # uvloop's C event loop and httptools' C HTTP parser roughly double
+        # throughput for an I/O-bound app of this shape versus the default
+        # asyncio/h11 stack; one worker per CPU outside of debug since each
+        # worker multiplexes many requests over a few motor connections.
+        uvicorn.run(
+            "server:app",
+            host="0.0.0.0",
+            port=3001,
+            reload=DEBUG,
+            loop="uvloop",
+            http="httptools",
+            workers=1 if DEBUG else (os.cpu_count() or 1),
+        )
     except KeyboardInterrupt:
         pass
 